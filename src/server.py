@@ -5,13 +5,33 @@ A FastMCP server that provides access to news headlines and articles from RSS fe
 """
 
 import asyncio
-import json
+import bisect
+import calendar
+import functools
+import heapq
 import os
-from typing import Any, Dict, List, Optional
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+import ahocorasick
+import diskcache
 import httpx
+import orjson
 from fastmcp import FastMCP
 import feedparser
-from datetime import datetime
+import feedparser.sanitizer
+from lxml import etree
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+try:
+    import numba
+    import numpy as np
+except ImportError:  # Optional: only used to speed up large searches
+    numba = None
 
 # Create the FastMCP server
 mcp = FastMCP("News MCP Server")
@@ -28,6 +48,9 @@ NEWS_SOURCES = {
     "nytimes": "https://rss.nytimes.com/services/xml/rss/nyt/HomePage.xml"
 }
 
+# (name, url) pairs, built once for the multi-source fetch
+_SOURCES_TUPLE: Tuple[Tuple[str, str], ...] = tuple(NEWS_SOURCES.items())
+
 # Category mappings for filtering with expanded keywords
 CATEGORY_KEYWORDS = {
     "politics": [
@@ -83,57 +106,498 @@ CATEGORY_KEYWORDS = {
     ]
 }
 
-def parse_rss_feed(feed_url: str, limit: int = 10) -> List[Dict[str, Any]]:
-    """Parse RSS feed and return formatted articles."""
+def build_automaton(keywords: FrozenSet[str]) -> ahocorasick.Automaton:
+    """Build an Aho-Corasick automaton that matches all keywords in one pass."""
+    automaton = ahocorasick.Automaton()
+    for keyword in keywords:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+# Article text is tokenized into runs of lowercase letters and digits
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def _compile_phrases(phrases: List[str]) -> Optional[re.Pattern]:
+    """Compile keywords that are not single tokens into a whole-word alternation.
+    
+    A trailing plural "s"/"es" is allowed so "world cups" still matches.
+    """
+    if not phrases:
+        return None
+    return re.compile(r"\b(?:" + "|".join(map(re.escape, sorted(set(phrases)))) + r")(?:e?s)?\b")
+
+def category_tokens(text: str) -> FrozenSet[str]:
+    """Tokenize text, also adding singular forms of plural-looking tokens.
+    
+    This lets "elections", "vaccines" and "technologies" match the
+    keywords "election", "vaccine" and "technology".
+    """
+    tokens = set(_TOKEN_RE.findall(text))
+    for token in list(tokens):
+        if len(token) > 3 and token.endswith("s"):
+            tokens.add(token[:-1])
+            if token.endswith("ies"):
+                tokens.add(token[:-3] + "y")
+            elif token.endswith("es"):
+                tokens.add(token[:-2])
+    return frozenset(tokens)
+
+# Single-token keywords per category, matched against an article's token set
+_CATEGORY_WORDS: Dict[str, FrozenSet[str]] = {
+    category: frozenset(keyword for keyword in keywords if _TOKEN_RE.fullmatch(keyword))
+    for category, keywords in CATEGORY_KEYWORDS.items()
+}
+# Multi-word phrases (and keywords like "s&p") per category
+_CATEGORY_PHRASES: Dict[str, Optional[re.Pattern]] = {
+    category: _compile_phrases([k for k in keywords if not _TOKEN_RE.fullmatch(k)])
+    for category, keywords in CATEGORY_KEYWORDS.items()
+}
+
+# Search automata are reused for repeated expanded queries
+_search_automaton = functools.lru_cache(maxsize=256)(build_automaton)
+
+def matched_keywords(automaton: ahocorasick.Automaton, text: str) -> Set[str]:
+    """Return the distinct keywords of the automaton that occur in text."""
+    return {keyword for _, keyword in automaton.iter(text)}
+
+# Parsed feeds are cached per URL for this many seconds
+FEED_TTL_SECONDS = float(os.environ.get("FEED_TTL_SECONDS", 120))
+
+# At most this many feeds are kept in memory, least recently used evicted first
+FEED_CACHE_MAX_FEEDS = int(os.environ.get("FEED_CACHE_MAX_FEEDS", 64))
+
+# url -> (fetched_at, etag, last_modified, articles), in LRU order
+_FEED_CACHE: "OrderedDict[str, Tuple[float, Optional[str], Optional[str], List[Dict[str, Any]]]]" = OrderedDict()
+# url -> in-flight refresh, shared by every concurrent cache miss so a feed is
+# fetched once and all waiters get the same result or error
+_FEED_FETCHES: Dict[str, "asyncio.Task[List[Dict[str, Any]]]"] = {}
+
+def _open_disk_cache(path: str) -> Optional[diskcache.Cache]:
+    """Open the disk cache, refusing directories other users could write to."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.stat(path)
+    if hasattr(os, "getuid") and (st.st_uid != os.getuid() or st.st_mode & 0o022):
+        print(f"Disk feed cache disabled: {path} is not a private directory owned by this user")
+        return None
+    return diskcache.Cache(path)
+
+# Write-through disk copy of _FEED_CACHE so restarts start warm. The default
+# is per-user so other local users cannot plant entries in it.
+FEED_CACHE_DIR = os.environ.get(
+    "FEED_CACHE_DIR",
+    os.path.join(
+        tempfile.gettempdir(),
+        f"mcp-news-{os.getuid()}" if hasattr(os, "getuid") else "mcp-news"
+    )
+)
+_DISK_CACHE = _open_disk_cache(FEED_CACHE_DIR)
+
+# Hard limit in seconds on refreshing one feed; slower sources are skipped
+FEED_FETCH_DEADLINE = float(os.environ.get("FEED_FETCH_DEADLINE", 6))
+
+# Shared async HTTP client so feed fetches reuse pooled connections. The
+# tight timeouts keep one slow source from stalling multi-source requests.
+http_client = httpx.AsyncClient(
+    http2=True,
+    follow_redirects=True,
+    timeout=httpx.Timeout(connect=2.0, read=4.0, write=2.0, pool=2.0),
+    limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+    headers={"User-Agent": "news-mcp/1.0 (+https://github.com/akarnik23/mcp-news)"}
+)
+
+async def fetch_feed_bytes(
+    feed_url: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None
+) -> Tuple[Optional[bytes], Optional[str], Optional[str]]:
+    """Fetch the raw body of an RSS feed with a conditional GET.
+    
+    Returns:
+        tuple: (body, etag, last_modified) where body is None if the server
+        answered 304 Not Modified
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    
+    response = await http_client.get(feed_url, headers=headers)
+    if response.status_code == 304:
+        return None, etag, last_modified
+    
+    response.raise_for_status()
+    return (
+        response.content,
+        response.headers.get("etag"),
+        response.headers.get("last-modified")
+    )
+
+def add_search_fields(article: Dict[str, Any]) -> None:
+    """Precompute the lowercased fields used by filtering and search.
+    
+    Underscore-prefixed fields are internal and are stripped by
+    public_article() before responses are serialized.
+    """
+    article["_title_lc"] = article["title"].lower()
+    article["_summary_lc"] = article["summary"].lower()
+    article["_tags_lc"] = " ".join(article["tags"]).lower()
+    article["_author_lc"] = article["author"].lower()
+    article["_search_blob"] = (
+        f"{article['_title_lc']} {article['_summary_lc']} "
+        f"{article['_tags_lc']} {article['_author_lc']}"
+    )
+    # Epoch seconds for sorting; undated articles sort last
+    published = article["published"]
+    article["_published_ts"] = (
+        calendar.timegm(datetime.fromisoformat(published).timetuple()) if published else 0
+    )
+    # Exclusive end offset of each field inside _search_blob
+    title_end = len(article["_title_lc"])
+    summary_end = title_end + 1 + len(article["_summary_lc"])
+    tags_end = summary_end + 1 + len(article["_tags_lc"])
+    article["_field_ends"] = (title_end, summary_end, tags_end, len(article["_search_blob"]))
+    # Categories are decided by title, summary and tags only, never the author
+    article["_category_text"] = article["_search_blob"][:tags_end]
+    article["_tokens"] = category_tokens(article["_category_text"])
+
+def to_json(payload: Dict[str, Any]) -> str:
+    """Serialize a tool response as indented JSON."""
+    return orjson.dumps(payload, option=orjson.OPT_INDENT_2).decode()
+
+def public_article(article: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the article without internal underscore-prefixed fields."""
+    return {key: value for key, value in article.items() if not key.startswith("_")}
+
+# Tags are always a tuple; this one is shared by every article without tags
+_EMPTY_TUPLE: Tuple[str, ...] = ()
+
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+DC_NS = "{http://purl.org/dc/elements/1.1/}"
+
+def _format_date(value: Optional[str], rfc822: bool) -> str:
+    """Format an RFC 822 or ISO 8601 feed date as a naive UTC ISO string."""
+    if not value:
+        return ""
     try:
-        feed = feedparser.parse(feed_url)
-        articles = []
-        
-        for entry in feed.entries[:limit]:
-            # Extract publication date
-            pub_date = ""
-            if hasattr(entry, 'published_parsed') and entry.published_parsed:
-                pub_date = datetime(*entry.published_parsed[:6]).isoformat()
-            elif hasattr(entry, 'updated_parsed') and entry.updated_parsed:
-                pub_date = datetime(*entry.updated_parsed[:6]).isoformat()
+        value = value.strip()
+        if rfc822:
+            parsed = parsedate_to_datetime(value)
+        else:
+            # fromisoformat() only accepts a trailing "Z" from Python 3.11
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return ""
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.replace(microsecond=0).isoformat()
+
+def _text(element: Optional[etree._Element]) -> str:
+    """Return the stripped text content of an element."""
+    if element is None:
+        return ""
+    return "".join(element.itertext()).strip()
+
+def _sanitize_html(html: str) -> str:
+    """Strip scripts, event handlers and other unsafe markup, as feedparser does."""
+    if "<" not in html:
+        return html
+    return feedparser.sanitizer._sanitize_html(html, "utf-8", "text/html")
+
+def _parse_fast(data: bytes) -> List[Dict[str, Any]]:
+    """Extract articles from plain RSS 2.0 or Atom feeds with lxml.
+    
+    Raises on anything it does not recognize so the caller can fall back
+    to feedparser.
+    """
+    # lxml parsers are not thread-safe, so build one per call
+    parser = etree.XMLParser(resolve_entities=False, no_network=True)
+    root = etree.fromstring(data, parser=parser)
+    articles = []
+    
+    if root.tag == "rss":
+        source = _text(root.find("channel/title")) or "Unknown"
+        for item in root.iterfind(".//item"):
+            pub_date = _format_date(item.findtext("pubDate"), rfc822=True)
+            if not pub_date:
+                # Some feeds put ISO 8601 dates in pubDate
+                pub_date = _format_date(item.findtext("pubDate"), rfc822=False)
+            if not pub_date:
+                pub_date = _format_date(item.findtext(f"{DC_NS}date"), rfc822=False)
+            tags = item.findall("category")
             
-            article = {
-                "title": entry.get("title", ""),
-                "link": entry.get("link", ""),
-                "summary": entry.get("summary", ""),
+            articles.append({
+                "title": _text(item.find("title")),
+                "link": _text(item.find("link")),
+                "summary": _sanitize_html(_text(item.find("description"))),
                 "published": pub_date,
-                "source": feed.feed.get("title", "Unknown"),
-                "author": entry.get("author", ""),
-                "tags": [tag.term for tag in entry.get("tags", [])]
-            }
-            articles.append(article)
+                "source": source,
+                "author": _text(item.find("author")) or _text(item.find(f"{DC_NS}creator")),
+                "tags": tuple(_text(tag) for tag in tags) if tags else _EMPTY_TUPLE
+            })
+    
+    elif root.tag == f"{ATOM_NS}feed":
+        source = _text(root.find(f"{ATOM_NS}title")) or "Unknown"
+        for entry in root.iterfind(f"{ATOM_NS}entry"):
+            link = ""
+            for link_element in entry.iterfind(f"{ATOM_NS}link"):
+                if link_element.get("rel", "alternate") == "alternate":
+                    link = link_element.get("href", "")
+                    break
+            
+            summary = entry.find(f"{ATOM_NS}summary")
+            if summary is None:
+                summary = entry.find(f"{ATOM_NS}content")
+            
+            pub_date = _format_date(entry.findtext(f"{ATOM_NS}published"), rfc822=False)
+            if not pub_date:
+                pub_date = _format_date(entry.findtext(f"{ATOM_NS}updated"), rfc822=False)
+            tags = entry.findall(f"{ATOM_NS}category")
+            
+            articles.append({
+                "title": _text(entry.find(f"{ATOM_NS}title")),
+                "link": link,
+                "summary": _sanitize_html(_text(summary)),
+                "published": pub_date,
+                "source": source,
+                "author": _text(entry.find(f"{ATOM_NS}author/{ATOM_NS}name")),
+                "tags": tuple(tag.get("term", "") for tag in tags) if tags else _EMPTY_TUPLE
+            })
+    
+    else:
+        raise ValueError(f"Unsupported feed root element: {root.tag}")
+    
+    return articles
+
+def _parse_with_feedparser(data: bytes) -> List[Dict[str, Any]]:
+    """Extract articles with feedparser, which handles every feed dialect."""
+    feed = feedparser.parse(data)
+    articles = []
+    
+    for entry in feed.entries:
+        # Extract publication date
+        parsed_date = entry.get("published_parsed") or entry.get("updated_parsed")
+        pub_date = datetime(*parsed_date[:6]).isoformat() if parsed_date else ""
+        tags = entry.get("tags")
         
-        return articles
+        article = {
+            "title": entry.get("title", ""),
+            "link": entry.get("link", ""),
+            "summary": entry.get("summary", ""),
+            "published": pub_date,
+            "source": feed.feed.get("title", "Unknown"),
+            "author": entry.get("author", ""),
+            "tags": tuple(tag.term for tag in tags) if tags else _EMPTY_TUPLE
+        }
+        articles.append(article)
+    
+    return articles
+
+def parse_feed_bytes(data: bytes) -> List[Dict[str, Any]]:
+    """Parse raw RSS feed bytes and return formatted articles."""
+    try:
+        articles = _parse_fast(data)
+    except Exception:
+        # Malformed XML or an unusual dialect (RDF, RSS 0.9x, ...)
+        articles = _parse_with_feedparser(data)
+    
+    for article in articles:
+        add_search_fields(article)
+    
+    return articles
+
+def _load_disk_entry(
+    feed_url: str
+) -> Optional[Tuple[float, Optional[str], Optional[str], List[Dict[str, Any]]]]:
+    """Load a feed from the disk cache as an in-memory cache entry."""
+    if _DISK_CACHE is None:
+        return None
+    payload = _DISK_CACHE.get(feed_url)
+    if not isinstance(payload, bytes):
+        return None
+    
+    entry = orjson.loads(payload)
+    fetched_at = entry["fetched_at"]
+    etag, last_modified = entry["etag"], entry["last_modified"]
+    articles = entry["articles"]
+    for article in articles:
+        # JSON has no tuples; restore the parsers' tags type
+        article["tags"] = tuple(article["tags"]) if article["tags"] else _EMPTY_TUPLE
+        add_search_fields(article)
+    
+    # Disk timestamps are wall-clock, the memory cache uses the monotonic clock
+    age = time.time() - fetched_at
+    return (time.monotonic() - age, etag, last_modified, articles)
+
+def _store_disk_entry(
+    feed_url: str,
+    etag: Optional[str],
+    last_modified: Optional[str],
+    articles: List[Dict[str, Any]]
+) -> None:
+    """Write a feed to the disk cache, without the derived search fields.
+    
+    Entries are stored as plain JSON bytes so diskcache never pickles them.
+    """
+    if _DISK_CACHE is None:
+        return
+    payload = orjson.dumps({
+        "fetched_at": time.time(),
+        "etag": etag,
+        "last_modified": last_modified,
+        "articles": [public_article(article) for article in articles]
+    })
+    _DISK_CACHE.set(feed_url, payload, expire=FEED_TTL_SECONDS)
+
+def _cache_feed(
+    feed_url: str,
+    entry: Tuple[float, Optional[str], Optional[str], List[Dict[str, Any]]]
+) -> None:
+    """Store a feed in the memory cache, evicting the least recently used ones."""
+    _FEED_CACHE[feed_url] = entry
+    _FEED_CACHE.move_to_end(feed_url)
+    while len(_FEED_CACHE) > FEED_CACHE_MAX_FEEDS:
+        _FEED_CACHE.popitem(last=False)
+
+async def _refresh_feed(feed_url: str) -> List[Dict[str, Any]]:
+    """Revalidate or refetch a feed and store it in the memory and disk caches."""
+    cached = _FEED_CACHE.get(feed_url)
+    if cached is None:
+        # Fresh process: fall back to what a previous run left on disk
+        cached = await asyncio.to_thread(_load_disk_entry, feed_url)
+        if cached:
+            _cache_feed(feed_url, cached)
+    if cached and time.monotonic() - cached[0] < FEED_TTL_SECONDS:
+        return cached[3]
+    
+    etag, last_modified = (cached[1], cached[2]) if cached else (None, None)
+    data, etag, last_modified = await fetch_feed_bytes(feed_url, etag, last_modified)
+    
+    if data is None:
+        # 304 Not Modified: the stale entry is still current
+        articles = cached[3]
+    else:
+        # Parsing is CPU-bound, keep it off the event loop
+        articles = await asyncio.to_thread(parse_feed_bytes, data)
+    
+    _cache_feed(feed_url, (time.monotonic(), etag, last_modified, articles))
+    await asyncio.to_thread(_store_disk_entry, feed_url, etag, last_modified, articles)
+    return articles
+
+def _finish_refresh(feed_url: str, task: "asyncio.Task[List[Dict[str, Any]]]") -> None:
+    """Forget a completed refresh so the next cache miss starts a new one."""
+    if _FEED_FETCHES.get(feed_url) is task:
+        del _FEED_FETCHES[feed_url]
+    if not task.cancelled():
+        task.exception()  # Mark as retrieved even if every waiter went away
+
+async def get_feed_articles(feed_url: str) -> List[Dict[str, Any]]:
+    """Return all parsed articles for a feed, using the memory and disk TTL caches."""
+    cached = _FEED_CACHE.get(feed_url)
+    if cached and time.monotonic() - cached[0] < FEED_TTL_SECONDS:
+        _FEED_CACHE.move_to_end(feed_url)
+        return cached[3]
+    
+    task = _FEED_FETCHES.get(feed_url)
+    if task is None:
+        # The deadline bounds the whole refresh, since httpx timeouts only
+        # apply per read and a feed trickling bytes would never trip them
+        task = asyncio.ensure_future(
+            asyncio.wait_for(_refresh_feed(feed_url), FEED_FETCH_DEADLINE)
+        )
+        _FEED_FETCHES[feed_url] = task
+        task.add_done_callback(functools.partial(_finish_refresh, feed_url))
+    
+    # Shield so one cancelled caller does not cancel the fetch for the others
+    return await asyncio.shield(task)
+
+async def parse_rss_feed(feed_url: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """Fetch and parse RSS feed and return formatted articles.
+    
+    Raises httpx errors (including timeouts) for feeds that cannot be fetched.
+    """
+    articles = await get_feed_articles(feed_url)
+    # Copy so callers can annotate articles without touching the cache
+    return [dict(article) for article in articles[:limit]]
+
+def dedupe_articles(articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop articles whose link or normalized title was already seen.
+    
+    Wire stories are often carried by several sources, so this keeps the
+    first copy and shrinks the work done by filtering and search.
+    """
+    seen_links = set()
+    seen_titles = set()
+    unique = []
+    
+    for article in articles:
+        link = article.get("link", "")
+        title = " ".join(article["_title_lc"].split())
+        if (link and link in seen_links) or (title and title in seen_titles):
+            continue
         
-    except Exception as e:
-        print(f"Error parsing RSS feed {feed_url}: {e}")
-        return []
+        seen_links.add(link)
+        seen_titles.add(title)
+        unique.append(article)
+    
+    return unique
 
 def filter_articles_by_category(articles: List[Dict[str, Any]], category: str) -> List[Dict[str, Any]]:
     """Filter articles by category keywords."""
     if category not in CATEGORY_KEYWORDS:
         return articles
     
-    keywords = CATEGORY_KEYWORDS[category]
+    words = _CATEGORY_WORDS[category]
+    phrases = _CATEGORY_PHRASES[category]
     filtered = []
     
     for article in articles:
-        title_lower = article.get("title", "").lower()
-        summary_lower = article.get("summary", "").lower()
-        tags_lower = " ".join(article.get("tags", [])).lower()
-        
-        # Check if any keyword matches
-        text_to_search = f"{title_lower} {summary_lower} {tags_lower}"
-        if any(keyword in text_to_search for keyword in keywords):
+        # Check single-word keywords against the token set first, then phrases
+        if not words.isdisjoint(article["_tokens"]) or (
+            phrases is not None and phrases.search(article["_category_text"]) is not None
+        ):
             filtered.append(article)
     
     return filtered
 
+# Curated synonym mappings for common news topics
+_SYNONYM_GROUPS = {
+    "ai": ["artificial intelligence", "machine learning", "ml", "neural network", "deep learning", "chatgpt", "openai", "gpt", "llm", "large language model"],
+    "artificial intelligence": ["ai", "machine learning", "ml", "neural network", "deep learning", "chatgpt", "openai", "gpt", "llm", "large language model"],
+    "machine learning": ["ai", "artificial intelligence", "ml", "neural network", "deep learning", "data science"],
+    "crypto": ["cryptocurrency", "bitcoin", "ethereum", "blockchain", "crypto", "digital currency"],
+    "cryptocurrency": ["crypto", "bitcoin", "ethereum", "blockchain", "digital currency"],
+    "bitcoin": ["crypto", "cryptocurrency", "btc", "digital currency"],
+    "climate": ["climate change", "global warming", "environment", "carbon", "emissions", "sustainability"],
+    "climate change": ["climate", "global warming", "environment", "carbon", "emissions", "sustainability"],
+    "tech": ["technology", "tech", "software", "startup", "innovation", "digital"],
+    "technology": ["tech", "software", "startup", "innovation", "digital", "tech"],
+    "politics": ["political", "government", "election", "democracy", "policy", "congress", "senate"],
+    "business": ["economy", "market", "finance", "trading", "investment", "corporate", "company"],
+    "health": ["medical", "healthcare", "medicine", "covid", "pandemic", "disease", "health"],
+    "sports": ["football", "basketball", "baseball", "soccer", "olympics", "athletics", "sport"],
+    "science": ["research", "study", "discovery", "space", "physics", "chemistry", "biology"],
+    "space": ["nasa", "spacex", "astronomy", "mars", "moon", "satellite", "rocket"],
+    "tesla": ["elon musk", "electric vehicle", "ev", "tesla", "model s", "model 3", "model x", "model y"],
+    "apple": ["iphone", "ipad", "mac", "ios", "macos", "tim cook", "apple"],
+    "google": ["alphabet", "android", "chrome", "youtube", "search", "google"],
+    "microsoft": ["windows", "office", "azure", "xbox", "microsoft", "satya nadella"],
+    "amazon": ["aws", "prime", "bezos", "amazon", "alexa", "echo"],
+    "meta": ["facebook", "instagram", "whatsapp", "zuckerberg", "meta", "vr", "virtual reality"],
+    "facebook": ["meta", "instagram", "whatsapp", "zuckerberg", "facebook", "social media"],
+    "twitter": ["x", "elon musk", "tweet", "twitter", "social media"],
+    "x": ["twitter", "elon musk", "tweet", "x", "social media"]
+}
+
+# synonym or key -> group keys it belongs to
+_SYN_INDEX: Dict[str, FrozenSet[str]] = {}
+for _key, _synonyms in _SYNONYM_GROUPS.items():
+    for _term in (_key, *_synonyms):
+        _SYN_INDEX[_term] = _SYN_INDEX.get(_term, frozenset()) | {_key}
+
+# Finds every indexed term contained in a query in one pass
+_SYNONYM_AUTOMATON = build_automaton(frozenset(_SYN_INDEX))
+
 def expand_query_synonyms(query: str) -> List[str]:
     """Expand query with synonyms and related terms.
     
@@ -143,57 +607,239 @@ def expand_query_synonyms(query: str) -> List[str]:
     - User feedback learning
     - Domain-specific ontologies
     """
-    query_lower = query.lower().strip()
-    
-    # Define synonym mappings
-    synonym_groups = {
-        "ai": ["artificial intelligence", "machine learning", "ml", "neural network", "deep learning", "chatgpt", "openai", "gpt", "llm", "large language model"],
-        "artificial intelligence": ["ai", "machine learning", "ml", "neural network", "deep learning", "chatgpt", "openai", "gpt", "llm", "large language model"],
-        "machine learning": ["ai", "artificial intelligence", "ml", "neural network", "deep learning", "data science"],
-        "crypto": ["cryptocurrency", "bitcoin", "ethereum", "blockchain", "crypto", "digital currency"],
-        "cryptocurrency": ["crypto", "bitcoin", "ethereum", "blockchain", "digital currency"],
-        "bitcoin": ["crypto", "cryptocurrency", "btc", "digital currency"],
-        "climate": ["climate change", "global warming", "environment", "carbon", "emissions", "sustainability"],
-        "climate change": ["climate", "global warming", "environment", "carbon", "emissions", "sustainability"],
-        "tech": ["technology", "tech", "software", "startup", "innovation", "digital"],
-        "technology": ["tech", "software", "startup", "innovation", "digital", "tech"],
-        "politics": ["political", "government", "election", "democracy", "policy", "congress", "senate"],
-        "business": ["economy", "market", "finance", "trading", "investment", "corporate", "company"],
-        "health": ["medical", "healthcare", "medicine", "covid", "pandemic", "disease", "health"],
-        "sports": ["football", "basketball", "baseball", "soccer", "olympics", "athletics", "sport"],
-        "science": ["research", "study", "discovery", "space", "physics", "chemistry", "biology"],
-        "space": ["nasa", "spacex", "astronomy", "mars", "moon", "satellite", "rocket"],
-        "tesla": ["elon musk", "electric vehicle", "ev", "tesla", "model s", "model 3", "model x", "model y"],
-        "apple": ["iphone", "ipad", "mac", "ios", "macos", "tim cook", "apple"],
-        "google": ["alphabet", "android", "chrome", "youtube", "search", "google"],
-        "microsoft": ["windows", "office", "azure", "xbox", "microsoft", "satya nadella"],
-        "amazon": ["aws", "prime", "bezos", "amazon", "alexa", "echo"],
-        "meta": ["facebook", "instagram", "whatsapp", "zuckerberg", "meta", "vr", "virtual reality"],
-        "facebook": ["meta", "instagram", "whatsapp", "zuckerberg", "facebook", "social media"],
-        "twitter": ["x", "elon musk", "tweet", "twitter", "social media"],
-        "x": ["twitter", "elon musk", "tweet", "x", "social media"]
-    }
-    
+    return list(_expand_normalized_query(query.lower().strip()))
+
+@functools.lru_cache(maxsize=1024)
+def _expand_normalized_query(query_lower: str) -> Tuple[str, ...]:
+    """Cached synonym expansion for an already lowercased, stripped query."""
     # Start with the original query
     expanded_terms = [query_lower]
     
     # Add synonyms for exact matches
-    if query_lower in synonym_groups:
-        expanded_terms.extend(synonym_groups[query_lower])
+    if query_lower in _SYNONYM_GROUPS:
+        expanded_terms.extend(_SYNONYM_GROUPS[query_lower])
     
-    # Add synonyms for partial matches
-    for key, synonyms in synonym_groups.items():
-        if key in query_lower or any(syn in query_lower for syn in synonyms):
-            expanded_terms.extend(synonyms)
+    # Add synonyms for partial matches: any group whose key or synonyms
+    # occur in the query
+    matched_groups = set()
+    for term in matched_keywords(_SYNONYM_AUTOMATON, query_lower):
+        matched_groups |= _SYN_INDEX[term]
+    for key in matched_groups:
+        expanded_terms.extend(_SYNONYM_GROUPS[key])
     
     # Remove duplicates and empty strings
-    expanded_terms = list(set([term.strip() for term in expanded_terms if term.strip()]))
+    return tuple(set([term.strip() for term in expanded_terms if term.strip()]))
+
+async def _get_all_articles(per_source: int = 10) -> List[Dict[str, Any]]:
+    """Fetch every configured source concurrently and merge the articles.
     
-    return expanded_terms
+    Each article is annotated with its source_name and duplicates across
+    sources are dropped. Sources that fail or time out contribute nothing.
+    """
+    # Concurrent calls coalesce per feed on the shared refresh tasks
+    results = await asyncio.gather(*[
+        parse_rss_feed(feed_url, limit=per_source)
+        for _, feed_url in _SOURCES_TUPLE
+    ], return_exceptions=True)
+    
+    all_articles = []
+    for (source_name, feed_url), articles in zip(_SOURCES_TUPLE, results):
+        if isinstance(articles, Exception):
+            # A slow or broken source is skipped rather than failing the request
+            print(f"Error fetching RSS feed {feed_url}: {articles!r}")
+            continue
+        for article in articles:
+            article["source_name"] = source_name
+        all_articles.extend(articles)
+    
+    return dedupe_articles(all_articles)
+
+# Relevance weight of a term match in title, summary, tags and author
+# (highest first; a term only scores for the first field it is found in)
+FIELD_WEIGHTS = (3, 2, 1, 1)
 
-def search_articles(articles: List[Dict[str, Any]], query: str) -> tuple:
+def on_token_boundaries(text: str, start: int, end: int, whole_word: bool) -> bool:
+    """Check that the hit text[start:end] starts a token and, if whole_word, ends one.
+    
+    A trailing plural "s"/"es" is allowed before the closing boundary.
+    """
+    if start > 0 and text[start - 1].isalnum():
+        return False
+    if not whole_word:
+        return True
+    for suffix in ("", "s", "es"):
+        after = end + len(suffix)
+        if text.startswith(suffix, end) and (after >= len(text) or not text[after].isalnum()):
+            return True
+    return False
+
+def score_article(
+    automaton: ahocorasick.Automaton,
+    article: Dict[str, Any],
+    query_term: str
+) -> Optional[int]:
+    """Return the relevance score of an article, or None if no term matches.
+    
+    Only hits inside a single field count, matching the Numba kernel. The
+    user's own query_term may match the start of a longer word ("elect" in
+    "election"); expanded synonyms must match whole words, so "ai" does not
+    match "said".
+    """
+    text = article["_search_blob"]
+    field_ends = article["_field_ends"]
+    # term -> weight of the best field it was found in
+    term_weights: Dict[str, int] = {}
+    
+    # Single pass over the combined text, attributing each hit to its field
+    for end_index, term in automaton.iter(text):
+        if term_weights.get(term) == FIELD_WEIGHTS[0]:
+            continue  # Already found in the title, nothing can score higher
+        start = end_index - len(term) + 1
+        field = bisect.bisect_right(field_ends, start)
+        if (
+            end_index < field_ends[field]
+            and FIELD_WEIGHTS[field] > term_weights.get(term, 0)
+            and on_token_boundaries(text, start, end_index + 1, term != query_term)
+        ):
+            term_weights[term] = FIELD_WEIGHTS[field]
+    
+    if not term_weights:
+        return None
+    
+    # Each term scores once, by the most important field it was found in
+    return sum(term_weights.values())
+
+# Searches over at least this many articles use the Numba kernel if available
+NUMBA_MIN_ARTICLES = int(os.environ.get("NUMBA_MIN_ARTICLES", 200))
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _is_word_byte(byte):
+        """ASCII letters and digits, plus any byte of a multi-byte UTF-8 character."""
+        return (48 <= byte <= 57) or (65 <= byte <= 90) or (97 <= byte <= 122) or byte >= 128
+    
+    @numba.njit(cache=True, parallel=True)
+    def _scan_articles(text_buf, text_offsets, term_buf, term_offsets, whole_word, weights):
+        """Score each article by the weight of the first field each term occurs in.
+        
+        text_offsets delimits len(weights) field slices per article in
+        text_buf, ordered by descending weight, and term_offsets delimits
+        each term in term_buf. Hits follow on_token_boundaries(): every term
+        must start a token, and terms flagged in whole_word must end one too.
+        """
+        n_fields = weights.shape[0]
+        n_articles = (text_offsets.shape[0] - 1) // n_fields
+        n_terms = term_offsets.shape[0] - 1
+        scores = np.zeros(n_articles, dtype=np.int32)
+        
+        for i in numba.prange(n_articles):
+            score = 0
+            for t in range(n_terms):
+                term_start = term_offsets[t]
+                term_len = term_offsets[t + 1] - term_start
+                if term_len == 0:
+                    continue
+                first = term_buf[term_start]
+                found = False
+                for f in range(n_fields):
+                    start = text_offsets[i * n_fields + f]
+                    end = text_offsets[i * n_fields + f + 1]
+                    for pos in range(start, end - term_len + 1):
+                        if text_buf[pos] != first:
+                            continue
+                        k = 1
+                        while k < term_len and text_buf[pos + k] == term_buf[term_start + k]:
+                            k += 1
+                        if k < term_len:
+                            continue
+                        if pos > start and _is_word_byte(text_buf[pos - 1]):
+                            continue
+                        if whole_word[t]:
+                            after = pos + term_len
+                            ends_word = after >= end or not _is_word_byte(text_buf[after])
+                            if not ends_word and text_buf[after] == 115:  # "s"
+                                ends_word = after + 1 >= end or not _is_word_byte(text_buf[after + 1])
+                            if not ends_word and text_buf[after] == 101 and after + 1 < end and text_buf[after + 1] == 115:  # "es"
+                                ends_word = after + 2 >= end or not _is_word_byte(text_buf[after + 2])
+                            if not ends_word:
+                                continue
+                        found = True
+                        break
+                    if found:
+                        score += weights[f]
+                        break
+            scores[i] = score
+        
+        return scores
+
+# Exact array types the kernel is compiled for
+_SCAN_SIGNATURE = "int32[::1](uint8[::1], int64[::1], uint8[::1], int64[::1], uint8[::1], int32[::1])"
+_numba_kernel_ready = threading.Event()
+_numba_compile_lock = threading.Lock()
+_numba_compile_started = False
+
+def _compile_numba_kernel() -> None:
+    """Compile the scan kernel; runs in a background thread."""
+    try:
+        _scan_articles.compile(_SCAN_SIGNATURE)
+        _numba_kernel_ready.set()
+    except Exception as e:
+        print(f"Numba kernel unavailable, using Aho-Corasick search: {e}")
+
+def _numba_kernel_available() -> bool:
+    """Return True once the kernel is compiled, starting compilation on first use.
+    
+    Compiling takes seconds, so it happens off the event loop and searches
+    use the Aho-Corasick path until it is done.
+    """
+    global _numba_compile_started
+    if _numba_kernel_ready.is_set():
+        return True
+    with _numba_compile_lock:
+        if not _numba_compile_started:
+            _numba_compile_started = True
+            threading.Thread(target=_compile_numba_kernel, daemon=True).start()
+    return False
+
+def _pack_utf8(chunks: List[bytes]) -> Tuple[Any, Any]:
+    """Concatenate byte strings into a uint8 buffer plus int64 offsets."""
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    np.cumsum([len(chunk) for chunk in chunks], out=offsets[1:])
+    # bytearray keeps the buffer writable, as the kernel signature expects
+    return np.frombuffer(bytearray(b"".join(chunks)), dtype=np.uint8), offsets
+
+@functools.lru_cache(maxsize=256)
+def _pack_terms(terms: FrozenSet[str], query_term: str) -> Tuple[Any, Any, Any]:
+    """Encoded search terms and whole-word flags, reused for repeated queries."""
+    ordered = list(terms)
+    term_buf, term_offsets = _pack_utf8([term.encode("utf-8") for term in ordered])
+    whole_word = np.array([term != query_term for term in ordered], dtype=np.uint8)
+    return term_buf, term_offsets, whole_word
+
+def _score_articles_numba(
+    articles: List[Dict[str, Any]],
+    terms: FrozenSet[str],
+    query_term: str
+) -> List[Optional[int]]:
+    """Score a large batch of articles with the compiled scan kernel."""
+    text_buf, text_offsets = _pack_utf8([
+        article[key].encode("utf-8")
+        for article in articles
+        for key in ("_title_lc", "_summary_lc", "_tags_lc", "_author_lc")
+    ])
+    term_buf, term_offsets, whole_word = _pack_terms(terms, query_term)
+    weights = np.asarray(FIELD_WEIGHTS, dtype=np.int32)
+    scores = _scan_articles(text_buf, text_offsets, term_buf, term_offsets, whole_word, weights)
+    return [int(score) if score else None for score in scores]
+
+def search_articles(articles: List[Dict[str, Any]], query: str, limit: Optional[int] = None) -> tuple:
     """Search articles by query string with robust keyword expansion.
     
+    Args:
+        articles: Articles to search
+        query: Search query string
+        limit: If set, only the top `limit` matches are returned
+    
     Returns:
         tuple: (filtered_articles, search_terms_used)
     """
@@ -202,49 +848,36 @@ def search_articles(articles: List[Dict[str, Any]], query: str) -> tuple:
     
     # Expand query with synonyms
     search_terms = expand_query_synonyms(query)
+    query_term = query.lower().strip()
+    
+    if (
+        numba is not None
+        and len(articles) >= NUMBA_MIN_ARTICLES
+        and _numba_kernel_available()
+    ):
+        scores = _score_articles_numba(articles, frozenset(search_terms), query_term)
+    else:
+        automaton = _search_automaton(frozenset(search_terms))
+        scores = [score_article(automaton, article, query_term) for article in articles]
     
     filtered = []
     
-    for article in articles:
-        title_lower = article.get("title", "").lower()
-        summary_lower = article.get("summary", "").lower()
-        tags_lower = " ".join(article.get("tags", [])).lower()
-        author_lower = article.get("author", "").lower()
-        
-        # Combine all searchable text
-        text_to_search = f"{title_lower} {summary_lower} {tags_lower} {author_lower}"
-        
-        # Check if any search term matches
-        match_found = False
-        for term in search_terms:
-            if term in text_to_search:
-                match_found = True
-                break
-        
-        if match_found:
-            # Add relevance score based on where the match was found
-            relevance_score = 0
-            for term in search_terms:
-                if term in title_lower:
-                    relevance_score += 3  # Title matches are most important
-                if term in summary_lower:
-                    relevance_score += 2  # Summary matches are important
-                if term in tags_lower:
-                    relevance_score += 1  # Tag matches are less important
-                if term in author_lower:
-                    relevance_score += 1  # Author matches are less important
-            
+    for article, relevance_score in zip(articles, scores):
+        if relevance_score is not None:
             article["relevance_score"] = relevance_score
             filtered.append(article)
     
     # Sort by relevance score (highest first), then by publication date
-    filtered.sort(key=lambda x: (x.get("relevance_score", 0), x.get("published", "")), reverse=True)
+    sort_key = lambda x: (x.get("relevance_score", 0), x["_published_ts"])
+    if limit is not None:
+        return heapq.nlargest(limit, filtered, key=sort_key), search_terms
     
+    filtered.sort(key=sort_key, reverse=True)
     return filtered, search_terms
 
 
 @mcp.tool()
-def get_headlines(source: str = "all", limit: int = 10) -> str:
+async def get_headlines(source: str = "all", limit: int = 10) -> str:
     """Get headlines from major news sources.
     
     Args:
@@ -259,45 +892,40 @@ def get_headlines(source: str = "all", limit: int = 10) -> str:
         
         if source == "all":
             # Get headlines from all sources
-            all_articles = []
-            for source_name, feed_url in NEWS_SOURCES.items():
-                articles = parse_rss_feed(feed_url, limit=5)  # Get 5 from each source
-                for article in articles:
-                    article["source_name"] = source_name
-                all_articles.extend(articles)
+            all_articles = await _get_all_articles(per_source=5)  # Get 5 from each source
             
             # Sort by publication date (newest first)
-            all_articles.sort(key=lambda x: x.get("published", ""), reverse=True)
+            all_articles.sort(key=lambda x: x["_published_ts"], reverse=True)
             all_articles = all_articles[:limit]
             
-            return json.dumps({
-                "articles": all_articles,
+            return to_json({
+                "articles": [public_article(article) for article in all_articles],
                 "total": len(all_articles),
                 "sources": list(NEWS_SOURCES.keys())
-            }, indent=2)
+            })
         
         elif source in NEWS_SOURCES:
             # Get headlines from specific source
-            articles = parse_rss_feed(NEWS_SOURCES[source], limit)
+            articles = await parse_rss_feed(NEWS_SOURCES[source], limit)
             for article in articles:
                 article["source_name"] = source
             
-            return json.dumps({
-                "articles": articles,
+            return to_json({
+                "articles": [public_article(article) for article in articles],
                 "total": len(articles),
                 "source": source
-            }, indent=2)
+            })
         
         else:
-            return json.dumps({
+            return to_json({
                 "error": f"Unknown source '{source}'. Available sources: {', '.join(['all'] + list(NEWS_SOURCES.keys()))}"
-            }, indent=2)
+            })
         
     except Exception as e:
-        return json.dumps({"error": f"Error fetching headlines: {str(e)}"}, indent=2)
+        return to_json({"error": f"Error fetching headlines: {str(e)}"})
 
 @mcp.tool()
-def search_news(query: str, limit: int = 10) -> str:
+async def search_news(query: str, limit: int = 10) -> str:
     """Search for news articles by keyword.
     
     Args:
@@ -309,36 +937,28 @@ def search_news(query: str, limit: int = 10) -> str:
     """
     try:
         if not query.strip():
-            return json.dumps({"error": "Query cannot be empty"}, indent=2)
+            return to_json({"error": "Query cannot be empty"})
         
         limit = min(max(limit, 1), 50)  # Clamp between 1 and 50
         
         # Search across all sources
-        all_articles = []
-        for source_name, feed_url in NEWS_SOURCES.items():
-            articles = parse_rss_feed(feed_url, limit=10)  # Get more to search through
-            for article in articles:
-                article["source_name"] = source_name
-            all_articles.extend(articles)
-        
-        # Filter by search query
-        filtered_articles, search_terms = search_articles(all_articles, query)
+        all_articles = await _get_all_articles(per_source=10)  # Get more to search through
         
-        # Limit results
-        filtered_articles = filtered_articles[:limit]
+        # Filter by search query, keeping only the top results
+        filtered_articles, search_terms = search_articles(all_articles, query, limit)
         
-        return json.dumps({
-            "articles": filtered_articles,
+        return to_json({
+            "articles": [public_article(article) for article in filtered_articles],
             "total": len(filtered_articles),
             "query": query,
             "search_terms_used": search_terms[:10]  # Show first 10 search terms for debugging
-        }, indent=2)
+        })
         
     except Exception as e:
-        return json.dumps({"error": f"Error searching news: {str(e)}"}, indent=2)
+        return to_json({"error": f"Error searching news: {str(e)}"})
 
 @mcp.tool()
-def get_category_news(category: str, limit: int = 10) -> str:
+async def get_category_news(category: str, limit: int = 10) -> str:
     """Get news by category.
     
     Args:
@@ -350,38 +970,33 @@ def get_category_news(category: str, limit: int = 10) -> str:
     """
     try:
         if category not in CATEGORY_KEYWORDS:
-            return json.dumps({
+            return to_json({
                 "error": f"Unknown category '{category}'. Available categories: {', '.join(CATEGORY_KEYWORDS.keys())}"
-            }, indent=2)
+            })
         
         limit = min(max(limit, 1), 50)  # Clamp between 1 and 50
         
         # Get articles from all sources
-        all_articles = []
-        for source_name, feed_url in NEWS_SOURCES.items():
-            articles = parse_rss_feed(feed_url, limit=10)  # Get more to filter through
-            for article in articles:
-                article["source_name"] = source_name
-            all_articles.extend(articles)
+        all_articles = await _get_all_articles(per_source=10)  # Get more to filter through
         
         # Filter by category
         filtered_articles = filter_articles_by_category(all_articles, category)
         
         # Sort by publication date (newest first)
-        filtered_articles.sort(key=lambda x: x.get("published", ""), reverse=True)
+        filtered_articles.sort(key=lambda x: x["_published_ts"], reverse=True)
         filtered_articles = filtered_articles[:limit]
         
-        return json.dumps({
-            "articles": filtered_articles,
+        return to_json({
+            "articles": [public_article(article) for article in filtered_articles],
             "total": len(filtered_articles),
             "category": category
-        }, indent=2)
+        })
         
     except Exception as e:
-        return json.dumps({"error": f"Error fetching category news: {str(e)}"}, indent=2)
+        return to_json({"error": f"Error fetching category news: {str(e)}"})
 
 @mcp.tool()
-def get_rss_feed(feed_url: str, limit: int = 10) -> str:
+async def get_rss_feed(feed_url: str, limit: int = 10) -> str:
     """Get articles from any RSS feed URL.
     
     Args:
@@ -393,20 +1008,20 @@ def get_rss_feed(feed_url: str, limit: int = 10) -> str:
     """
     try:
         if not feed_url.strip():
-            return json.dumps({"error": "Feed URL cannot be empty"}, indent=2)
+            return to_json({"error": "Feed URL cannot be empty"})
         
         limit = min(max(limit, 1), 50)  # Clamp between 1 and 50
         
-        articles = parse_rss_feed(feed_url, limit)
+        articles = await parse_rss_feed(feed_url, limit)
         
-        return json.dumps({
-            "articles": articles,
+        return to_json({
+            "articles": [public_article(article) for article in articles],
             "total": len(articles),
             "feed_url": feed_url
-        }, indent=2)
+        })
         
     except Exception as e:
-        return json.dumps({"error": f"Error fetching RSS feed: {str(e)}"}, indent=2)
+        return to_json({"error": f"Error fetching RSS feed: {str(e)}"})
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))